@@ -0,0 +1,40 @@
+## @file _lookup.py
+## @brief Cursor lookups shared by the completion, hover and definition providers.
+##
+## Both read indexes built once per parse (ParsedDocument.token_starts and
+## ParsedDocument.scope_by_line) instead of scanning tokens or functions.
+
+from __future__ import annotations
+
+from bisect import bisect_right
+
+from lsprotocol.types import Position
+
+from .parser import ParsedDocument, Token, TokenType
+
+
+def token_index(doc: ParsedDocument, line: int, character: int) -> int:
+    """@brief Index of the token on `line` that starts at or before `character`.
+    @return  Index into doc.tokens[line], or -1 if there is none.
+    """
+    if line >= len(doc.token_starts):
+        return -1
+    return bisect_right(doc.token_starts[line], character) - 1
+
+
+def token_at(doc: ParsedDocument, pos: Position) -> Token | None:
+    """@brief Return the non-whitespace token under the cursor, or None."""
+    idx = token_index(doc, pos.line, pos.character)
+    if idx < 0:
+        return None
+    t = doc.tokens[pos.line][idx]
+    if pos.character < t.end_col and t.type != TokenType.WHITESPACE:
+        return t
+    return None
+
+
+def scope_at(doc: ParsedDocument, line: int) -> str | None:
+    """@brief Return the enclosing function name, or None at global scope."""
+    if line < len(doc.scope_by_line):
+        return doc.scope_by_line[line]
+    return None
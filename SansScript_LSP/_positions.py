@@ -0,0 +1,29 @@
+## @file _positions.py
+## @brief Memoized LSP Position / Range construction.
+##
+## Outline, hover and definition responses rebuild the same coordinates on
+## every request. The objects are only serialized, never mutated, so equal
+## coordinates can share one instance.
+
+from __future__ import annotations
+
+from functools import lru_cache
+
+from lsprotocol.types import Position, Range
+
+
+@lru_cache(maxsize=4096)
+def pos(line: int, character: int) -> Position:
+    """@brief Return a shared Position for (line, character)."""
+    return Position(line=line, character=character)
+
+
+@lru_cache(maxsize=4096)
+def span(start_line: int, start_char: int, end_line: int, end_char: int) -> Range:
+    """@brief Return a shared Range between two coordinates."""
+    return Range(start=pos(start_line, start_char), end=pos(end_line, end_char))
+
+
+def line_span(line: int, start_char: int, end_char: int) -> Range:
+    """@brief Return a shared Range within a single line."""
+    return span(line, start_char, line, end_char)
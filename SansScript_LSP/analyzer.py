@@ -6,14 +6,16 @@
 
 from __future__ import annotations
 
+from typing import Iterator
+
 from lsprotocol.types import Diagnostic, DiagnosticSeverity, Position, Range
 
-from .parser import ParsedDocument, TokenType, _significant_tokens, measure_indent
+from .parser import ParsedDocument, TokenType, measure_indent
 from .symbols import (
-    BLOCK_OPENERS,
     BUILTIN_MAP,
     BUILTIN_NAMES,
     KEYWORD_NAMES,
+    KEYWORDS,
     CONSTANT_NAMES,
     LOGICAL_OP_NAMES,
 )
@@ -35,179 +37,211 @@ def _whole_line_range(line: int, text: str) -> Range:
     )
 
 
+def _moved(diag: Diagnostic, line: int) -> Diagnostic:
+    """@brief Copy a single-line diagnostic onto another line."""
+    return Diagnostic(
+        range=_line_range(line, diag.range.start.character, diag.range.end.character),
+        message=diag.message,
+        severity=diag.severity,
+    )
+
+
+# Statement kind ("if", "elif", ...) of each keyword, for dispatching on a line's first token.
+_FIRST_TOKEN_DISPATCH: dict[str, str] = {kw.name: kw.english for kw in KEYWORDS}
+
+# Orphaned elif/else are matched on the start of the line's text, not its
+# first token, so 'अन्यथाx:' is checked like 'अन्यथा:'.
+_IF_PREFIX = "यदि"
+_ELIF_PREFIX = "अथवा_यदि"
+_ELSE_PREFIX = "अन्यथा"
+
+_PAREN_OPEN = TokenType.PAREN_OPEN.value
+_PAREN_CLOSE = TokenType.PAREN_CLOSE.value
+_BRACKET_OPEN = TokenType.BRACKET_OPEN.value
+_BRACKET_CLOSE = TokenType.BRACKET_CLOSE.value
+_IDENTIFIER = TokenType.IDENTIFIER.value
+_WHITESPACE = TokenType.WHITESPACE.value
+
+
 def analyze(doc: ParsedDocument) -> list[Diagnostic]:
     """@brief Produce diagnostics for a parsed SansScript document.
     @param doc  Parsed document to analyze.
     @return     List of LSP diagnostics.
     """
-    diags: list[Diagnostic] = []
+    return list(iter_analyze(doc))
 
-    _check_indentation(doc, diags)
-    _check_block_structure(doc, diags)
-    _check_orphaned_elif_else(doc, diags)
-    _check_unmatched_parens(doc, diags)
-    _check_undefined_references(doc, diags)
 
-    return diags
+def iter_analyze(doc: ParsedDocument) -> Iterator[Diagnostic]:
+    """@brief Yield diagnostics for a parsed SansScript document, in line order.
+    @param doc  Parsed document to analyze.
+    @return     Iterator of LSP diagnostics.
 
+    All checks run in a single walk over the lines: indentation after block
+    openers, block/function header structure, orphaned अथवा_यदि / अन्यथा,
+    unmatched ( ) [ ] and calls to undefined functions. The per-line results
+    are only stored on doc (for reuse by the next parse) once the iterator
+    has been exhausted.
+    """
+    diags_by_line: list[list[Diagnostic]] = []
+    carried = doc.prev_diags_by_line
+
+    arrays = doc.token_arrays
+    types = arrays.types
+    cols = arrays.cols
+    end_cols = arrays.end_cols
+    value_idx = arrays.value_idx
+    values = arrays.values
+    line_offsets = arrays.line_offsets
+
+    # Hot-loop names bound once as locals instead of global/attribute lookups.
+    paren_open = _PAREN_OPEN
+    paren_close = _PAREN_CLOSE
+    bracket_open = _BRACKET_OPEN
+    bracket_close = _BRACKET_CLOSE
+    identifier = _IDENTIFIER
+    whitespace = _WHITESPACE
+    Diag = Diagnostic
+    whole_line_range = _whole_line_range
+    line_range = _line_range
+    error = DiagnosticSeverity.Error
+    warning = DiagnosticSeverity.Warning
+    dispatch = _FIRST_TOKEN_DISPATCH.get
+    callable_names = doc.func_names | BUILTIN_NAMES | KEYWORD_NAMES
+    all_stripped = doc.stripped
+    line_indents = doc.line_indents
+    first_sig_token = doc.first_sig_token
+    line_opens_block = doc.line_opens_block
 
-def _check_indentation(doc: ParsedDocument, diags: list[Diagnostic]) -> None:
-    """@brief Warn when a block opener is not followed by an indented line."""
     prev_indent = 0
     prev_is_block_opener = False
+    last_if_indent: dict[int, int] = {}
 
     for lineno, line in enumerate(doc.lines):
-        stripped = line.strip()
-        if not stripped or stripped.startswith('#'):
+        stripped = all_stripped[lineno]
+        indent = line_indents[lineno]
+        first = first_sig_token[lineno]
+        head = first.value if first is not None else ""
+        kind = dispatch(head)
+        ends_with_colon = stripped.endswith(':')
+
+        # Indentation and orphaned elif/else only look at code lines.
+        if stripped and not stripped.startswith('#'):
+            if prev_is_block_opener and indent <= prev_indent:
+                yield Diag(
+                    range=whole_line_range(lineno, line),
+                    message="Expected indented block after previous statement.",
+                    severity=warning,
+                )
+            prev_indent = indent
+            prev_is_block_opener = line_opens_block[lineno]
+
+            if ends_with_colon and stripped.startswith(_IF_PREFIX):
+                last_if_indent[indent] = lineno
+            elif stripped.startswith(_ELIF_PREFIX):
+                if indent not in last_if_indent:
+                    yield Diag(
+                        range=whole_line_range(lineno, line),
+                        message="'अथवा_यदि' without a preceding 'यदि' at the same indentation.",
+                        severity=error,
+                    )
+                else:
+                    last_if_indent[indent] = lineno
+            elif ends_with_colon and stripped.startswith(_ELSE_PREFIX):
+                if indent not in last_if_indent:
+                    yield Diag(
+                        range=whole_line_range(lineno, line),
+                        message="'अन्यथा' without a preceding 'यदि' at the same indentation.",
+                        severity=error,
+                    )
+                else:
+                    del last_if_indent[indent]
+            else:
+                last_if_indent.pop(indent, None)
+
+        # Everything below depends only on this line (and the set of function
+        # names), so an unchanged line reuses what the previous parse found.
+        cached = carried[lineno] if carried is not None else None
+        if cached is not None:
+            if cached and cached[0].range.start.line != lineno:
+                cached = [_moved(d, lineno) for d in cached]
+            diags_by_line.append(cached)
+            yield from cached
             continue
 
-        indent = doc.line_indents[lineno]
-
-        if prev_is_block_opener and indent <= prev_indent:
-            diags.append(Diagnostic(
-                range=_whole_line_range(lineno, line),
-                message="Expected indented block after previous statement.",
-                severity=DiagnosticSeverity.Warning,
-            ))
-
-        prev_indent = indent
-        prev_is_block_opener = stripped.endswith(':') and _line_opens_block(stripped)
-
-
-def _line_opens_block(stripped: str) -> bool:
-    for kw in BLOCK_OPENERS:
-        if stripped.startswith(kw):
-            return True
-    return False
+        local: list[Diagnostic] = []
 
-
-def _check_block_structure(doc: ParsedDocument, diags: list[Diagnostic]) -> None:
-    """@brief Check function definitions and block openers for structural errors."""
-    for lineno, toks in enumerate(doc.tokens):
-        sig = _significant_tokens(toks)
-        if not sig:
-            continue
-
-        if sig[0].type == TokenType.KEYWORD and sig[0].value == "कार्यम्":
-            line_text = doc.lines[lineno].strip()
-            if '(' not in line_text or not line_text.endswith(':'):
-                diags.append(Diagnostic(
-                    range=_whole_line_range(lineno, doc.lines[lineno]),
+        # Block structure: headers must carry their ':' (and parens for functions).
+        if kind == "function":
+            if '(' not in stripped or not ends_with_colon:
+                local.append(Diag(
+                    range=whole_line_range(lineno, line),
                     message="Function definition must be: कार्यम् name(params):",
-                    severity=DiagnosticSeverity.Error,
+                    severity=error,
                 ))
-            elif ')' not in line_text:
-                diags.append(Diagnostic(
-                    range=_whole_line_range(lineno, doc.lines[lineno]),
+            elif ')' not in stripped:
+                local.append(Diag(
+                    range=whole_line_range(lineno, line),
                     message="Missing closing parenthesis in function definition.",
-                    severity=DiagnosticSeverity.Error,
+                    severity=error,
                 ))
-
-        if sig[0].type == TokenType.KEYWORD and sig[0].value in ("यदि", "यावत्", "अथवा_यदि"):
-            line_text = doc.lines[lineno].strip()
-            if not line_text.endswith(':'):
-                diags.append(Diagnostic(
-                    range=_whole_line_range(lineno, doc.lines[lineno]),
-                    message=f"'{sig[0].value}' statement must end with ':'",
-                    severity=DiagnosticSeverity.Error,
+        elif kind in ("if", "while", "elif"):
+            if not ends_with_colon:
+                local.append(Diag(
+                    range=whole_line_range(lineno, line),
+                    message=f"'{head}' statement must end with ':'",
+                    severity=error,
                 ))
-
-        if sig[0].type == TokenType.KEYWORD and sig[0].value == "अन्यथा":
-            line_text = doc.lines[lineno].strip()
-            if not line_text.endswith(':'):
-                diags.append(Diagnostic(
-                    range=_whole_line_range(lineno, doc.lines[lineno]),
+        elif kind == "else":
+            if not ends_with_colon:
+                local.append(Diag(
+                    range=whole_line_range(lineno, line),
                     message="'अन्यथा' must end with ':'",
-                    severity=DiagnosticSeverity.Error,
+                    severity=error,
                 ))
 
-
-def _check_orphaned_elif_else(doc: ParsedDocument, diags: list[Diagnostic]) -> None:
-    """@brief Detect अथवा_यदि / अन्यथा without a preceding यदि at the same indent."""
-    last_if_indent: dict[int, int] = {}
-
-    for lineno, line in enumerate(doc.lines):
-        stripped = line.strip()
-        if not stripped or stripped.startswith('#'):
-            continue
-
-        indent = doc.line_indents[lineno]
-
-        if stripped.startswith("यदि") and stripped.endswith(':'):
-            last_if_indent[indent] = lineno
-        elif stripped.startswith("अथवा_यदि"):
-            if indent not in last_if_indent:
-                diags.append(Diagnostic(
-                    range=_whole_line_range(lineno, line),
-                    message="'अथवा_यदि' without a preceding 'यदि' at the same indentation.",
-                    severity=DiagnosticSeverity.Error,
-                ))
-            else:
-                last_if_indent[indent] = lineno
-        elif stripped.startswith("अन्यथा") and stripped.endswith(':'):
-            if indent not in last_if_indent:
-                diags.append(Diagnostic(
-                    range=_whole_line_range(lineno, line),
-                    message="'अन्यथा' without a preceding 'यदि' at the same indentation.",
-                    severity=DiagnosticSeverity.Error,
-                ))
-            else:
-                del last_if_indent[indent]
-        else:
-            last_if_indent.pop(indent, None)
-
-
-def _check_unmatched_parens(doc: ParsedDocument, diags: list[Diagnostic]) -> None:
-    """@brief Check for unmatched ( ) [ ] on each line."""
-    for lineno, toks in enumerate(doc.tokens):
+        # Bracket balance and undefined calls share one scan of the token arrays.
+        # `pending` is the last identifier not yet followed by a significant
+        # token: if that token turns out to be '(' the identifier is a call.
         paren_depth = 0
         bracket_depth = 0
-        for t in toks:
-            if t.type == TokenType.PAREN_OPEN:
+        pending = -1
+        for i in range(line_offsets[lineno], line_offsets[lineno + 1]):
+            tt = types[i]
+            if tt == whitespace:
+                continue
+            if tt == paren_open:
                 paren_depth += 1
-            elif t.type == TokenType.PAREN_CLOSE:
+                if pending >= 0:
+                    name = values[value_idx[pending]]
+                    if name not in callable_names:
+                        local.append(Diag(
+                            range=line_range(lineno, cols[pending], end_cols[pending]),
+                            message=f"Undefined function '{name}'.",
+                            severity=warning,
+                        ))
+            elif tt == paren_close:
                 paren_depth -= 1
-            elif t.type == TokenType.BRACKET_OPEN:
+            elif tt == bracket_open:
                 bracket_depth += 1
-            elif t.type == TokenType.BRACKET_CLOSE:
+            elif tt == bracket_close:
                 bracket_depth -= 1
+            pending = i if tt == identifier else -1
 
         if paren_depth != 0:
-            diags.append(Diagnostic(
-                range=_whole_line_range(lineno, doc.lines[lineno]),
+            local.append(Diag(
+                range=whole_line_range(lineno, line),
                 message="Unmatched parentheses on this line.",
-                severity=DiagnosticSeverity.Error,
+                severity=error,
             ))
         if bracket_depth != 0:
-            diags.append(Diagnostic(
-                range=_whole_line_range(lineno, doc.lines[lineno]),
+            local.append(Diag(
+                range=whole_line_range(lineno, line),
                 message="Unmatched brackets on this line.",
-                severity=DiagnosticSeverity.Error,
+                severity=error,
             ))
 
+        diags_by_line.append(local)
+        yield from local
 
-def _check_undefined_references(doc: ParsedDocument, diags: list[Diagnostic]) -> None:
-    """@brief Warn when a called function is not defined and not a builtin."""
-    for lineno, toks in enumerate(doc.tokens):
-        for idx, t in enumerate(toks):
-            if t.type != TokenType.IDENTIFIER:
-                continue
-            next_tok = _next_significant(toks, idx)
-            if next_tok and next_tok.type == TokenType.PAREN_OPEN:
-                name = t.value
-                if (name not in doc.functions
-                        and name not in BUILTIN_NAMES
-                        and name not in KEYWORD_NAMES):
-                    diags.append(Diagnostic(
-                        range=_line_range(lineno, t.col, t.end_col),
-                        message=f"Undefined function '{name}'.",
-                        severity=DiagnosticSeverity.Warning,
-                    ))
-
-
-def _next_significant(toks: list, start_idx: int):
-    """@brief Return the next non-whitespace token after start_idx, or None."""
-    for t in toks[start_idx + 1:]:
-        if t.type != TokenType.WHITESPACE:
-            return t
-    return None
+    doc.diags_by_line = diags_by_line
+    doc.prev_diags_by_line = None
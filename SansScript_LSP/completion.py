@@ -3,6 +3,8 @@
 
 from __future__ import annotations
 
+import re
+
 from lsprotocol.types import (
     CompletionItem,
     CompletionItemKind,
@@ -11,13 +13,73 @@ from lsprotocol.types import (
     Position,
 )
 
-from .parser import ParsedDocument, TokenType, _significant_tokens
+from ._lookup import scope_at, token_index
+from .parser import (
+    PREFIX_INDEX_LEN,
+    ParsedDocument,
+    TokenType,
+    VarDef,
+    index_by_prefix,
+)
 from .symbols import (
-    BUILTIN_MAP,
     BUILTINS,
     CONSTANTS,
     KEYWORDS,
     LOGICAL_OPS,
+    BuiltinInfo,
+    KeywordInfo,
+)
+
+
+# Identifier characters immediately before the end position (may be empty).
+# The lookbehind lets a match start only where a run of them starts, so the
+# search stays linear in the length of the run instead of quadratic.
+_IDENT_TAIL = re.compile(r'(?<![A-Za-z0-9_\u0900-\u097F])[A-Za-z0-9_\u0900-\u097F]*$')
+
+
+def _keyword_item(kw: KeywordInfo) -> CompletionItem:
+    item = CompletionItem(
+        label=kw.name,
+        kind=CompletionItemKind.Keyword,
+        detail=f"({kw.english})",
+        documentation=kw.doc,
+    )
+    if kw.snippet:
+        item.insert_text = kw.snippet
+        item.insert_text_format = InsertTextFormat.Snippet
+    return item
+
+
+def _builtin_item(bi: BuiltinInfo) -> CompletionItem:
+    sig = f"{bi.name}({', '.join(bi.params)})"
+    snippet_params = ", ".join(f"${{{i+1}:{p}}}" for i, p in enumerate(bi.params))
+    return CompletionItem(
+        label=bi.name,
+        kind=CompletionItemKind.Function,
+        detail=f"{bi.english}: {sig}",
+        documentation=bi.doc,
+        insert_text=f"{bi.name}({snippet_params})",
+        insert_text_format=InsertTextFormat.Snippet,
+    )
+
+
+# Static items are built once; responses are only serialized, never mutated,
+# so the same instances can be shared across requests.
+_KEYWORD_ITEMS: list[CompletionItem] = [_keyword_item(kw) for kw in KEYWORDS]
+_BUILTIN_ITEMS: list[CompletionItem] = [_builtin_item(bi) for bi in BUILTINS]
+_CONSTANT_ITEMS: list[CompletionItem] = [
+    CompletionItem(label=name, kind=CompletionItemKind.Constant, detail=doc_text)
+    for name, doc_text in CONSTANTS.items()
+]
+_LOGICAL_OP_ITEMS: list[CompletionItem] = [
+    CompletionItem(label=name, kind=CompletionItemKind.Operator, detail=doc_text)
+    for name, doc_text in LOGICAL_OPS.items()
+]
+_STATIC_ITEMS: list[CompletionItem] = (
+    _KEYWORD_ITEMS + _BUILTIN_ITEMS + _CONSTANT_ITEMS + _LOGICAL_OP_ITEMS
+)
+_STATIC_BY_PREFIX: dict[str, list[CompletionItem]] = index_by_prefix(
+    _STATIC_ITEMS, lambda item: item.label
 )
 
 
@@ -27,58 +89,30 @@ def provide_completions(doc: ParsedDocument, pos: Position) -> CompletionList:
     @param pos  Cursor position.
     @return     CompletionList with keywords, builtins, user symbols, and variables.
     """
-    items: list[CompletionItem] = []
-    prefix = _word_at_cursor(doc, pos)
-    current_scope = _current_scope(doc, pos.line)
+    if _in_string_or_comment(doc, pos):
+        return CompletionList(is_incomplete=False, items=[])
 
-    for kw in KEYWORDS:
-        if prefix and not kw.name.startswith(prefix):
-            continue
-        item = CompletionItem(
-            label=kw.name,
-            kind=CompletionItemKind.Keyword,
-            detail=f"({kw.english})",
-            documentation=kw.doc,
-        )
-        if kw.snippet:
-            item.insert_text = kw.snippet
-            item.insert_text_format = InsertTextFormat.Snippet
-        items.append(item)
-
-    for bi in BUILTINS:
-        if prefix and not bi.name.startswith(prefix):
-            continue
-        sig = f"{bi.name}({', '.join(bi.params)})"
-        snippet_params = ", ".join(f"${{{i+1}:{p}}}" for i, p in enumerate(bi.params))
-        items.append(CompletionItem(
-            label=bi.name,
-            kind=CompletionItemKind.Function,
-            detail=f"{bi.english}: {sig}",
-            documentation=bi.doc,
-            insert_text=f"{bi.name}({snippet_params})",
-            insert_text_format=InsertTextFormat.Snippet,
-        ))
-
-    for name, doc_text in CONSTANTS.items():
-        if prefix and not name.startswith(prefix):
-            continue
-        items.append(CompletionItem(
-            label=name,
-            kind=CompletionItemKind.Constant,
-            detail=doc_text,
-        ))
-
-    for name, doc_text in LOGICAL_OPS.items():
-        if prefix and not name.startswith(prefix):
-            continue
-        items.append(CompletionItem(
-            label=name,
-            kind=CompletionItemKind.Operator,
-            detail=doc_text,
-        ))
-
-    for fname, fdef in doc.functions.items():
-        if prefix and not fname.startswith(prefix):
+    prefix = _word_at_cursor(doc, pos)
+    current_scope = scope_at(doc, pos.line)
+
+    key = prefix[:PREFIX_INDEX_LEN]
+    exact = len(prefix) <= PREFIX_INDEX_LEN
+
+    items: list[CompletionItem]
+    if not prefix:
+        items = list(_STATIC_ITEMS)
+    elif exact:
+        items = list(_STATIC_BY_PREFIX.get(key, ()))
+    else:
+        items = [
+            item for item in _STATIC_BY_PREFIX.get(key, ())
+            if item.label.startswith(prefix)
+        ]
+
+    functions = doc.functions.values() if not prefix else doc.functions_by_prefix.get(key, ())
+    for fdef in functions:
+        fname = fdef.name
+        if not exact and not fname.startswith(prefix):
             continue
         param_names = [p.name for p in fdef.params]
         sig = f"{fname}({', '.join(param_names)})"
@@ -91,50 +125,55 @@ def provide_completions(doc: ParsedDocument, pos: Position) -> CompletionList:
             insert_text_format=InsertTextFormat.Snippet,
         ))
 
-    seen_vars: set[str] = set()
-    for key, vdef in doc.variables.items():
-        name = vdef.name
-        if name in seen_vars:
+    # Locals of the enclosing function first; globals they shadow are skipped.
+    if current_scope is not None:
+        for vdef in doc.variables_by_scope.get(current_scope, ()):
+            if prefix and not vdef.name.startswith(prefix):
+                continue
+            items.append(_variable_item(vdef))
+    for vdef in doc.global_variables:
+        if prefix and not vdef.name.startswith(prefix):
             continue
-        if prefix and not name.startswith(prefix):
+        if current_scope is not None and (current_scope, vdef.name) in doc.variables:
             continue
-        if vdef.scope == "global" or vdef.scope == current_scope:
-            seen_vars.add(name)
-            items.append(CompletionItem(
-                label=name,
-                kind=CompletionItemKind.Variable,
-                detail=f"variable ({vdef.scope})",
-            ))
+        items.append(_variable_item(vdef))
 
     return CompletionList(is_incomplete=False, items=items)
 
 
+def _variable_item(vdef: VarDef) -> CompletionItem:
+    return CompletionItem(
+        label=vdef.name,
+        kind=CompletionItemKind.Variable,
+        detail=f"variable ({vdef.scope or 'global'})",
+    )
+
+
+def _in_string_or_comment(doc: ParsedDocument, pos: Position) -> bool:
+    """@brief Whether the cursor sits inside a string literal or a comment."""
+    if pos.line >= len(doc.tokens) or pos.character <= 0:
+        return False
+    toks = doc.tokens[pos.line]
+    if not toks:
+        return False
+    if toks[-1].type == TokenType.COMMENT and toks[-1].col < pos.character:
+        return True
+    # The character before the cursor decides: inside "..." or after an unclosed quote.
+    idx = token_index(doc, pos.line, pos.character - 1)
+    if idx < 0:
+        return False
+    t = toks[idx]
+    if t.type != TokenType.STRING:
+        return False
+    closed = len(t.value) > 1 and t.value.endswith('"')
+    return pos.character < t.end_col or not closed
+
+
 def _word_at_cursor(doc: ParsedDocument, pos: Position) -> str:
     """@brief Extract the partial identifier being typed at the cursor."""
     if pos.line >= len(doc.lines):
         return ""
     line = doc.lines[pos.line]
     col = min(pos.character, len(line))
-    start = col
-    while start > 0 and _is_ident_char(line[start - 1]):
-        start -= 1
-    return line[start:col]
-
-
-def _is_ident_char(ch: str) -> bool:
-    cp = ord(ch)
-    return (
-        ch == '_'
-        or ('a' <= ch <= 'z')
-        or ('A' <= ch <= 'Z')
-        or ('0' <= ch <= '9')
-        or (0x0900 <= cp <= 0x097F)
-    )
-
-
-def _current_scope(doc: ParsedDocument, line: int) -> str:
-    """@brief Return the enclosing function name, or 'global'."""
-    for fname, fdef in doc.functions.items():
-        if fdef.line < line <= fdef.end_line:
-            return fname
-    return "global"
+    match = _IDENT_TAIL.search(line, 0, col)
+    return match.group() if match is not None else ""
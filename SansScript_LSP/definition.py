@@ -7,11 +7,12 @@ from lsprotocol.types import (
     DocumentSymbol,
     Location,
     Position,
-    Range,
     SymbolKind,
 )
 
-from .parser import ParsedDocument, TokenType
+from ._lookup import scope_at, token_at
+from ._positions import line_span, span
+from .parser import FuncDef, ParsedDocument, TokenType, VarDef
 
 
 def provide_definition(
@@ -23,7 +24,7 @@ def provide_definition(
     @param uri  Document URI for the returned Location.
     @return     Location of the definition, or None.
     """
-    token = _token_at_position(doc, pos)
+    token = token_at(doc, pos)
     if token is None:
         return None
 
@@ -36,27 +37,18 @@ def provide_definition(
         fdef = doc.functions[name]
         return Location(
             uri=uri,
-            range=Range(
-                start=Position(line=fdef.line, character=fdef.col),
-                end=Position(line=fdef.line, character=fdef.col + len(fdef.name)),
-            ),
+            range=line_span(fdef.line, fdef.col, fdef.col + len(fdef.name)),
         )
 
-    current_scope = _current_scope(doc, pos.line)
-    vdef = None
-    if current_scope != "global":
-        key = f"{current_scope}:{name}"
-        vdef = doc.variables.get(key)
-    if vdef is None:
-        vdef = doc.variables.get(name)
+    current_scope = scope_at(doc, pos.line)
+    vdef = doc.variables.get((current_scope, name))
+    if vdef is None and current_scope is not None:
+        vdef = doc.variables.get((None, name))
 
     if vdef is not None:
         return Location(
             uri=uri,
-            range=Range(
-                start=Position(line=vdef.line, character=vdef.col),
-                end=Position(line=vdef.line, character=vdef.col + len(vdef.name)),
-            ),
+            range=line_span(vdef.line, vdef.col, vdef.col + len(vdef.name)),
         )
 
     return None
@@ -68,56 +60,31 @@ def provide_document_symbols(doc: ParsedDocument) -> list[DocumentSymbol]:
     @return     List of DocumentSymbol for the outline view.
     """
     symbols: list[DocumentSymbol] = []
-
-    for fname, fdef in doc.functions.items():
-        param_names = [p.name for p in fdef.params]
-        detail = f"({', '.join(param_names)})"
-        sym_range = Range(
-            start=Position(line=fdef.line, character=0),
-            end=Position(line=fdef.end_line, character=len(doc.lines[fdef.end_line]) if fdef.end_line < len(doc.lines) else 0),
-        )
-        sel_range = Range(
-            start=Position(line=fdef.line, character=fdef.col),
-            end=Position(line=fdef.line, character=fdef.col + len(fname)),
-        )
-        symbols.append(DocumentSymbol(
-            name=fname,
-            kind=SymbolKind.Function,
-            range=sym_range,
-            selection_range=sel_range,
-            detail=detail,
-        ))
-
-    for key, vdef in doc.variables.items():
-        if vdef.scope != "global":
-            continue
-        line_end = vdef.col + len(vdef.name)
-        sym_range = Range(
-            start=Position(line=vdef.line, character=vdef.col),
-            end=Position(line=vdef.line, character=line_end),
-        )
-        symbols.append(DocumentSymbol(
-            name=vdef.name,
-            kind=SymbolKind.Variable,
-            range=sym_range,
-            selection_range=sym_range,
-        ))
-
+    symbols.extend(_function_symbol(doc, fdef) for fdef in doc.functions.values())
+    symbols.extend(_variable_symbol(vdef) for vdef in doc.global_variables)
     return symbols
 
 
-def _token_at_position(doc: ParsedDocument, pos: Position):
-    if pos.line >= len(doc.tokens):
-        return None
-    for t in doc.tokens[pos.line]:
-        if t.col <= pos.character < t.end_col:
-            if t.type != TokenType.WHITESPACE:
-                return t
-    return None
-
-
-def _current_scope(doc: ParsedDocument, line: int) -> str:
-    for fname, fdef in doc.functions.items():
-        if fdef.line < line <= fdef.end_line:
-            return fname
-    return "global"
+def _function_symbol(doc: ParsedDocument, fdef: FuncDef) -> DocumentSymbol:
+    param_names = [p.name for p in fdef.params]
+    detail = f"({', '.join(param_names)})"
+    end_char = len(doc.lines[fdef.end_line]) if fdef.end_line < len(doc.lines) else 0
+    sym_range = span(fdef.line, 0, fdef.end_line, end_char)
+    sel_range = line_span(fdef.line, fdef.col, fdef.col + len(fdef.name))
+    return DocumentSymbol(
+        name=fdef.name,
+        kind=SymbolKind.Function,
+        range=sym_range,
+        selection_range=sel_range,
+        detail=detail,
+    )
+
+
+def _variable_symbol(vdef: VarDef) -> DocumentSymbol:
+    sym_range = line_span(vdef.line, vdef.col, vdef.col + len(vdef.name))
+    return DocumentSymbol(
+        name=vdef.name,
+        kind=SymbolKind.Variable,
+        range=sym_range,
+        selection_range=sym_range,
+    )
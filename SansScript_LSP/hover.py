@@ -3,19 +3,29 @@
 
 from __future__ import annotations
 
-from lsprotocol.types import Hover, MarkupContent, MarkupKind, Position, Range
+from lsprotocol.types import Hover, MarkupContent, MarkupKind, Position
 
+from ._lookup import scope_at, token_at
+from ._positions import line_span
 from .parser import ParsedDocument, TokenType
 from .symbols import BUILTIN_MAP, CONSTANTS, KEYWORD_MAP, LOGICAL_OPS
 
 
+_CONSTANT_HOVER: dict[str, str] = {
+    name: f"**{name}** — {desc}" for name, desc in CONSTANTS.items() if desc
+}
+_LOGICAL_OP_HOVER: dict[str, str] = {
+    name: f"**{name}** — {desc}" for name, desc in LOGICAL_OPS.items() if desc
+}
+
+
 def provide_hover(doc: ParsedDocument, pos: Position) -> Hover | None:
     """@brief Return hover information for the token at the cursor.
     @param doc  Parsed document.
     @param pos  Cursor position.
     @return     Hover with markdown content, or None.
     """
-    token = _token_at_position(doc, pos)
+    token = token_at(doc, pos)
     if token is None:
         return None
 
@@ -24,28 +34,18 @@ def provide_hover(doc: ParsedDocument, pos: Position) -> Hover | None:
     if token.type == TokenType.KEYWORD:
         kw = KEYWORD_MAP.get(token.value)
         if kw:
-            content = f"**{kw.name}** — `{kw.english}`\n\n{kw.doc}"
+            content = kw.hover_md
 
     elif token.type == TokenType.BUILTIN:
         bi = BUILTIN_MAP.get(token.value)
         if bi:
-            sig = f"{bi.name}({', '.join(bi.params)})"
-            content = (
-                f"**{bi.name}** — `{bi.english}`\n\n"
-                f"```\n{sig}\n```\n\n"
-                f"{bi.doc}\n\n"
-                f"Returns: `{bi.return_type}`"
-            )
+            content = bi.hover_md
 
     elif token.type == TokenType.CONSTANT:
-        desc = CONSTANTS.get(token.value)
-        if desc:
-            content = f"**{token.value}** — {desc}"
+        content = _CONSTANT_HOVER.get(token.value)
 
     elif token.type == TokenType.LOGICAL_OP:
-        desc = LOGICAL_OPS.get(token.value)
-        if desc:
-            content = f"**{token.value}** — {desc}"
+        content = _LOGICAL_OP_HOVER.get(token.value)
 
     elif token.type == TokenType.IDENTIFIER:
         if token.value in doc.functions:
@@ -58,7 +58,7 @@ def provide_hover(doc: ParsedDocument, pos: Position) -> Hover | None:
             if vdef:
                 content = (
                     f"**variable** `{vdef.name}`\n\n"
-                    f"Scope: {vdef.scope}  \n"
+                    f"Scope: {vdef.scope or 'global'}  \n"
                     f"First assigned: line {vdef.line + 1}"
                 )
 
@@ -73,23 +73,10 @@ def provide_hover(doc: ParsedDocument, pos: Position) -> Hover | None:
 
     return Hover(
         contents=MarkupContent(kind=MarkupKind.Markdown, value=content),
-        range=Range(
-            start=Position(line=token.line, character=token.col),
-            end=Position(line=token.line, character=token.end_col),
-        ),
+        range=line_span(token.line, token.col, token.end_col),
     )
 
 
-def _token_at_position(doc: ParsedDocument, pos: Position):
-    if pos.line >= len(doc.tokens):
-        return None
-    for t in doc.tokens[pos.line]:
-        if t.col <= pos.character < t.end_col:
-            if t.type != TokenType.WHITESPACE:
-                return t
-    return None
-
-
 def _find_variable(doc: ParsedDocument, name: str, line: int):
     """@brief Find the best-matching variable definition for a name at a given line.
     @param doc   Parsed document.
@@ -97,16 +84,9 @@ def _find_variable(doc: ParsedDocument, name: str, line: int):
     @param line  Line number for scope resolution.
     @return      VarDef or None.
     """
-    current_scope = "global"
-    for fname, fdef in doc.functions.items():
-        if fdef.line < line <= fdef.end_line:
-            current_scope = fname
-            break
-
-    if current_scope != "global":
-        key = f"{current_scope}:{name}"
-        if key in doc.variables:
-            return doc.variables[key]
-    if name in doc.variables:
-        return doc.variables[name]
-    return None
+    current_scope = scope_at(doc, line)
+
+    vdef = doc.variables.get((current_scope, name))
+    if vdef is None and current_scope is not None:
+        vdef = doc.variables.get((None, name))
+    return vdef
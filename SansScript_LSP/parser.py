@@ -7,8 +7,12 @@
 from __future__ import annotations
 
 import re
+import sys
+from array import array
 from dataclasses import dataclass, field
-from enum import Enum, auto
+from enum import IntEnum, auto
+from itertools import accumulate, islice
+from typing import Callable, Iterable, NamedTuple, TypeVar
 
 from .symbols import (
     ALL_KNOWN,
@@ -20,7 +24,11 @@ from .symbols import (
 )
 
 
-class TokenType(Enum):
+# slots=True needs Python 3.10; on 3.9 the dataclasses simply keep their __dict__.
+_SLOTS: dict[str, bool] = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+class TokenType(IntEnum):
     KEYWORD = auto()
     BUILTIN = auto()
     CONSTANT = auto()
@@ -40,8 +48,11 @@ class TokenType(Enum):
     UNKNOWN = auto()
 
 
-@dataclass
-class Token:
+# Token types that carry no meaning for parsing or analysis.
+_INSIGNIFICANT = frozenset({TokenType.WHITESPACE, TokenType.COMMENT})
+
+
+class Token(NamedTuple):
     type: TokenType
     value: str
     line: int
@@ -49,14 +60,29 @@ class Token:
     end_col: int
 
 
-@dataclass
+class IdentRole(IntEnum):
+    """@brief What an IDENTIFIER token refers to, resolved once per parse."""
+    OTHER = 0
+    FUNCTION = auto()
+    PARAMETER = auto()
+
+
+# Indices of the first three significant (not whitespace or comment) tokens
+# of a line, -1 past the last one. Indices do not depend on the line number,
+# so they stay valid when the line is renumbered.
+LineMeta = tuple[int, int, int]
+
+_NO_META: LineMeta = (-1, -1, -1)
+
+
+@dataclass(**_SLOTS)
 class ParamInfo:
     name: str
     line: int
     col: int
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class FuncDef:
     name: str
     line: int
@@ -66,137 +92,226 @@ class FuncDef:
     body_indent: int = 0
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class VarDef:
     name: str
     line: int
     col: int
-    scope: str = "global"
+    # Enclosing function name, or None at top level. None can't collide with
+    # a function's name, even one called 'global'.
+    scope: str | None = None
+
+
+@dataclass
+class TokenArrays:
+    """@brief Column-wise copy of a document's tokens for tight scans.
+
+    Token i of the document has type `types[i]` (a TokenType value), spans
+    `cols[i]`..`end_cols[i]` and has text `values[value_idx[i]]`. For an
+    identifier, `roles[i]` says whether it names a function or parameter
+    (an IdentRole value; OTHER for every other token). The tokens of line n
+    are indices `line_offsets[n]` .. `line_offsets[n + 1] - 1`.
+    """
+    types: array[int] = field(default_factory=lambda: array('B'))
+    roles: array[int] = field(default_factory=lambda: array('B'))
+    cols: array[int] = field(default_factory=lambda: array('i'))
+    end_cols: array[int] = field(default_factory=lambda: array('i'))
+    value_idx: array[int] = field(default_factory=lambda: array('i'))
+    values: list[str] = field(default_factory=list)
+    line_offsets: array[int] = field(default_factory=lambda: array('i', [0]))
+    value_index: dict[str, int] = field(default_factory=dict, repr=False, compare=False)
 
 
 @dataclass
 class ParsedDocument:
     tokens: list[list[Token]]
     functions: dict[str, FuncDef]
-    variables: dict[str, VarDef]
+    variables: dict[tuple[str | None, str], VarDef]
     line_indents: list[int]
     lines: list[str]
+    global_variables: list[VarDef] = field(default_factory=list)
+    scope_by_line: list[str | None] = field(default_factory=list)
+    token_starts: list[list[int]] = field(default_factory=list)
+    stripped: list[str] = field(default_factory=list)
+    first_sig_token: list[Token | None] = field(default_factory=list)
+    line_meta: list[LineMeta] = field(default_factory=list)
+    line_opens_block: list[bool] = field(default_factory=list)
+    token_arrays: TokenArrays = field(default_factory=TokenArrays)
+    functions_by_prefix: dict[str, list[FuncDef]] = field(default_factory=dict)
+    variables_by_scope: dict[str | None, list[VarDef]] = field(default_factory=dict)
+    func_names: frozenset[str] = frozenset()
+    param_names: frozenset[str] = frozenset()
+    # Incremental diagnostics: the previous line-local diagnostics carried over
+    # to each line outside the edit (None when there are none to reuse), and
+    # this document's own, filled in by the analyzer.
+    prev_diags_by_line: list[list | None] | None = None
+    diags_by_line: list[list] | None = None
+
+
+PREFIX_INDEX_LEN = 3
+
+_T = TypeVar("_T")
+
+
+def index_by_prefix(items: Iterable[_T], name_of: Callable[[_T], str]) -> dict[str, list[_T]]:
+    """@brief Group items under each leading substring of their name.
+    @param items    Items to index, in the order they should be returned.
+    @param name_of  Returns the name an item is matched by.
+    @return         Map from the first 1..PREFIX_INDEX_LEN characters of a name to its items.
+
+    Callers look up prefix[:PREFIX_INDEX_LEN] and still check startswith(prefix)
+    when the prefix is longer than the indexed length.
+    """
+    index: dict[str, list[_T]] = {}
+    for item in items:
+        name = name_of(item)
+        for k in range(1, min(len(name), PREFIX_INDEX_LEN) + 1):
+            index.setdefault(name[:k], []).append(item)
+    return index
+
+
+# One alternation per token kind, tried in the same order as the original
+# character-by-character scanner: comment, whitespace, string, number
+# (Devanagari digits before identifiers), identifier, operators, punctuation,
+# and finally any other single character.
+_MASTER = re.compile(
+    r'(?P<COMMENT>#.*)'
+    r'|(?P<WS>[ \t]+)'
+    r'|(?P<STRING>"[^"]*"?)'
+    r'|(?P<NUMBER>[0-9\u0966-\u096F]+)'
+    r'|(?P<IDENT>[\u0900-\u097F_a-zA-Z][\u0900-\u097F_a-zA-Z0-9\u0966-\u096F]*)'
+    r'|(?P<OP2>==|!=|<=|>=)'
+    r'|(?P<OP1>[+\-*/%=<>])'
+    r'|(?P<LP>\()'
+    r'|(?P<RP>\))'
+    r'|(?P<LB>\[)'
+    r'|(?P<RB>\])'
+    r'|(?P<CM>,)'
+    r'|(?P<CO>:)'
+    r'|(?P<UNK>.)',
+    re.DOTALL,
+)
 
-
-_IDENT_START = re.compile(r'[\u0900-\u097F_a-zA-Z]')
-_IDENT_PART = re.compile(r'[\u0900-\u097F_a-zA-Z0-9\u0966-\u096F]')
-_DIGIT_START = re.compile(r'[0-9\u0966-\u096F]')
-_DIGIT_PART = re.compile(r'[0-9\u0966-\u096F]')
-
-_OPERATORS_DOUBLE = {"==", "!=", "<=", ">="}
-_OPERATORS_SINGLE = {"+", "-", "*", "/", "%", "=", "<", ">"}
-
-
-def _is_ident_start(ch: str) -> bool:
-    return bool(_IDENT_START.match(ch))
+_GROUP_TYPES: dict[str | None, TokenType] = {
+    "COMMENT": TokenType.COMMENT,
+    "WS": TokenType.WHITESPACE,
+    "STRING": TokenType.STRING,
+    "NUMBER": TokenType.NUMBER,
+    "OP2": TokenType.OPERATOR,
+    "OP1": TokenType.OPERATOR,
+    "LP": TokenType.PAREN_OPEN,
+    "RP": TokenType.PAREN_CLOSE,
+    "LB": TokenType.BRACKET_OPEN,
+    "RB": TokenType.BRACKET_CLOSE,
+    "CM": TokenType.COMMA,
+    "CO": TokenType.COLON,
+    "UNK": TokenType.UNKNOWN,
+}
+
+# Non-ASCII literals are not interned by the compiler; this one is compared
+# against (interned) token values on every line.
+_FUNCTION_KEYWORD = sys.intern("कार्यम्")
+
+# A line opens a block when its text merely starts with an opener keyword,
+# so 'यावत्x:' counts as well as 'यावत् x:'.
+_BLOCK_OPENER_PREFIXES = tuple(BLOCK_OPENERS)
+
+# Text of each two-character operator, keyed by its first character, so the
+# token shares one string instead of getting a fresh slice of the line.
+_OP2_TEXT: dict[str, str] = {"=": "==", "!": "!=", "<": "<=", ">": ">="}
+
+# Token type of every reserved word. Later entries win, so the merge order
+# keeps the old keyword > builtin > constant > logical-op precedence.
+# Identifiers are interned before the lookup, so their hash is already cached
+# and classifying one is a single dict probe; a per-character trie walk was
+# measured at over 10x that cost.
+_IDENT_KIND: dict[str, TokenType] = (
+    {name: TokenType.LOGICAL_OP for name in LOGICAL_OP_NAMES}
+    | {name: TokenType.CONSTANT for name in CONSTANT_NAMES}
+    | {name: TokenType.BUILTIN for name in BUILTIN_NAMES}
+    | {name: TokenType.KEYWORD for name in KEYWORD_NAMES}
+)
 
 
-def _is_ident_part(ch: str) -> bool:
-    return bool(_IDENT_PART.match(ch))
+# Tokens and LineMeta of recently seen line texts, least recently used first
+# (a hit moves its entry to the end; the first one is evicted). Lines repeat
+# within and across edits (closing lines, `अन्यथा:`, common statements), and
+# renumbering cached tokens is much cheaper than scanning the text again.
+_LINE_CACHE: dict[str, tuple[list[Token], LineMeta]] = {}
+_LINE_CACHE_SIZE = 4096
 
 
 def tokenize_line(text: str, line_no: int) -> list[Token]:
     """@brief Tokenize a single line of SansScript source.
     @param text     The source line to tokenize.
     @param line_no  0-based line number.
-    @return         List of tokens found on this line.
+    @return         List of tokens found on this line. It may be shared with
+                    earlier calls for the same text, so it must not be modified.
     """
-    tokens: list[Token] = []
-    i = 0
-    length = len(text)
-
-    while i < length:
-        ch = text[i]
+    return _tokenize_with_meta(text, line_no)[0]
 
-        if ch == '#':
-            tokens.append(Token(TokenType.COMMENT, text[i:], line_no, i, length))
-            break
-
-        if ch in (' ', '\t'):
-            start = i
-            while i < length and text[i] in (' ', '\t'):
-                i += 1
-            tokens.append(Token(TokenType.WHITESPACE, text[start:i], line_no, start, i))
-            continue
 
-        if ch == '"':
-            start = i
-            i += 1
-            while i < length and text[i] != '"':
-                i += 1
-            if i < length:
-                i += 1
-            tokens.append(Token(TokenType.STRING, text[start:i], line_no, start, i))
-            continue
-
-        if _DIGIT_START.match(ch):
-            start = i
-            while i < length and _DIGIT_PART.match(text[i]):
-                i += 1
-            tokens.append(Token(TokenType.NUMBER, text[start:i], line_no, start, i))
-            continue
-
-        if _is_ident_start(ch):
-            start = i
-            i += 1
-            while i < length and _is_ident_part(text[i]):
-                i += 1
-            word = text[start:i]
-            if word in KEYWORD_NAMES:
-                tt = TokenType.KEYWORD
-            elif word in BUILTIN_NAMES:
-                tt = TokenType.BUILTIN
-            elif word in CONSTANT_NAMES:
-                tt = TokenType.CONSTANT
-            elif word in LOGICAL_OP_NAMES:
-                tt = TokenType.LOGICAL_OP
-            else:
-                tt = TokenType.IDENTIFIER
-            tokens.append(Token(tt, word, line_no, start, i))
-            continue
-
-        if i + 1 < length and text[i:i+2] in _OPERATORS_DOUBLE:
-            tokens.append(Token(TokenType.OPERATOR, text[i:i+2], line_no, i, i + 2))
-            i += 2
-            continue
+def _tokenize_with_meta(text: str, line_no: int) -> tuple[list[Token], LineMeta]:
+    """@brief Tokenize a line and locate its leading significant tokens.
+    @param text     The source line to tokenize.
+    @param line_no  0-based line number.
+    @return         (tokens, LineMeta); both may come from _LINE_CACHE.
+    """
+    if not text:
+        return [], _NO_META
+
+    entry = _LINE_CACHE.pop(text, None)
+    if entry is not None:
+        tokens, meta = entry
+        if tokens[0].line != line_no:
+            entry = ([Token(t.type, t.value, line_no, t.col, t.end_col) for t in tokens], meta)
+    else:
+        tokens = _scan_line(text, line_no)
+        entry = (tokens, _line_meta(tokens))
+        if len(_LINE_CACHE) >= _LINE_CACHE_SIZE:
+            del _LINE_CACHE[next(iter(_LINE_CACHE))]
+    _LINE_CACHE[text] = entry
+    return entry
+
+
+def _line_meta(toks: list[Token]) -> LineMeta:
+    """@brief Find the first three significant tokens of a line.
+    @param toks  Token list for a line.
+    @return      Their indices into toks, -1 for each one that is missing.
+    """
+    found = [i for i, t in enumerate(toks) if t.type not in _INSIGNIFICANT][:3]
+    found += [-1] * (3 - len(found))
+    return (found[0], found[1], found[2])
 
-        if ch in _OPERATORS_SINGLE:
-            tokens.append(Token(TokenType.OPERATOR, ch, line_no, i, i + 1))
-            i += 1
-            continue
 
-        if ch == '(':
-            tokens.append(Token(TokenType.PAREN_OPEN, ch, line_no, i, i + 1))
-            i += 1
-            continue
-        if ch == ')':
-            tokens.append(Token(TokenType.PAREN_CLOSE, ch, line_no, i, i + 1))
-            i += 1
-            continue
-        if ch == '[':
-            tokens.append(Token(TokenType.BRACKET_OPEN, ch, line_no, i, i + 1))
-            i += 1
-            continue
-        if ch == ']':
-            tokens.append(Token(TokenType.BRACKET_CLOSE, ch, line_no, i, i + 1))
-            i += 1
-            continue
-        if ch == ',':
-            tokens.append(Token(TokenType.COMMA, ch, line_no, i, i + 1))
-            i += 1
-            continue
-        if ch == ':':
-            tokens.append(Token(TokenType.COLON, ch, line_no, i, i + 1))
-            i += 1
-            continue
+def _scan_line(text: str, line_no: int) -> list[Token]:
+    """@brief Run the master regex over a non-empty line.
+    @param text     The source line to tokenize.
+    @param line_no  0-based line number.
+    @return         List of tokens found on this line.
+    """
+    tokens: list[Token] = []
 
-        tokens.append(Token(TokenType.UNKNOWN, ch, line_no, i, i + 1))
-        i += 1
+    # Globals and attributes used per token, bound once as locals.
+    append = tokens.append
+    make = Token
+    intern = sys.intern
+    ident_kind = _IDENT_KIND.get
+    identifier = TokenType.IDENTIFIER
+    operator = TokenType.OPERATOR
+    op2_text = _OP2_TEXT
+    group_types = _GROUP_TYPES
+
+    for m in _MASTER.finditer(text):
+        kind = m.lastgroup
+        start, end = m.span()
+        if kind == "IDENT":
+            word = intern(m.group())
+            append(make(ident_kind(word, identifier), word, line_no, start, end))
+        elif kind == "OP2":
+            append(make(operator, op2_text[text[start]], line_no, start, end))
+        else:
+            append(make(group_types[kind], m.group(), line_no, start, end))
 
     return tokens
 
@@ -206,54 +321,91 @@ def measure_indent(line: str) -> int:
     @param line  Raw source line.
     @return      Number of equivalent spaces of indentation.
     """
-    indent = 0
-    for ch in line:
-        if ch == ' ':
-            indent += 1
-        elif ch == '\t':
-            indent += 4
-        else:
-            break
-    return indent
-
-
-def _significant_tokens(toks: list[Token]) -> list[Token]:
-    """@brief Filter out whitespace and comment tokens.
-    @param toks  Token list for a line.
-    @return      Tokens that carry semantic meaning.
-    """
-    return [t for t in toks if t.type not in (TokenType.WHITESPACE, TokenType.COMMENT)]
+    prefix_len = len(line) - len(line.lstrip(' \t'))
+    return prefix_len + 3 * line.count('\t', 0, prefix_len)
 
 
-def parse_document(source: str) -> ParsedDocument:
+def parse_document(source: str, previous: ParsedDocument | None = None) -> ParsedDocument:
     """@brief Parse a complete SansScript document.
-    @param source  Full document source text.
-    @return        ParsedDocument with tokens, functions, variables, and indent info.
+    @param source    Full document source text.
+    @param previous  Earlier parse of the same document, used to find changed lines.
+    @return          ParsedDocument with tokens, functions, variables, and indent info.
     """
     raw_lines = source.split('\n')
-    if raw_lines and raw_lines[-1] == '':
-        raw_lines = raw_lines[:-1]
-    if not raw_lines:
-        raw_lines = ['']
-
-    all_tokens: list[list[Token]] = []
-    line_indents: list[int] = []
+    if len(raw_lines) > 1 and raw_lines[-1] == '':
+        raw_lines.pop()
+    line_count = len(raw_lines)
+
+    # Per-line tables are allocated at their final size and filled by index.
+    all_tokens: list[list[Token]] = [[]] * line_count
+    line_indents = [0] * line_count
+    stripped = [''] * line_count
+    token_starts: list[list[int]] = [[]] * line_count
+    line_meta = [_NO_META] * line_count
     functions: dict[str, FuncDef] = {}
-    variables: dict[str, VarDef] = {}
+    variables: dict[tuple[str | None, str], VarDef] = {}
+
+    # Only the edited window is re-tokenized; lines before it are reused as-is
+    # and lines after it are renumbered if the edit added or removed lines.
+    window: tuple[int, int, int] | None = None
+    start = 0
+    old_stop = new_stop = line_count
+    if previous is not None:
+        window = _changed_lines(previous.lines, raw_lines)
+        start, old_stop, new_stop = window
+        all_tokens[:start] = previous.tokens[:start]
+        line_indents[:start] = previous.line_indents[:start]
+        stripped[:start] = previous.stripped[:start]
+        token_starts[:start] = previous.token_starts[:start]
+        line_meta[:start] = previous.line_meta[:start]
+
+    for lineno in range(start, new_stop):
+        line = raw_lines[lineno]
+        toks, meta = _tokenize_with_meta(line, lineno)
+        all_tokens[lineno] = toks
+        line_meta[lineno] = meta
+        line_indents[lineno] = measure_indent(line)
+        stripped[lineno] = line.strip()
+        token_starts[lineno] = [t.col for t in toks]
+
+    if previous is not None and new_stop < line_count:
+        shift = old_stop - new_stop
+        if shift:
+            for lineno in range(new_stop, line_count):
+                all_tokens[lineno] = [
+                    Token(t.type, t.value, lineno, t.col, t.end_col)
+                    for t in previous.tokens[lineno + shift]
+                ]
+        else:
+            all_tokens[new_stop:] = previous.tokens[new_stop:]
+        line_indents[new_stop:] = previous.line_indents[old_stop:]
+        stripped[new_stop:] = previous.stripped[old_stop:]
+        token_starts[new_stop:] = previous.token_starts[old_stop:]
+        line_meta[new_stop:] = previous.line_meta[old_stop:]
 
-    for lineno, line in enumerate(raw_lines):
-        toks = tokenize_line(line, lineno)
-        all_tokens.append(toks)
-        line_indents.append(measure_indent(line))
+    first_sig_token: list[Token | None] = [None] * line_count
+    line_opens_block = [False] * line_count
 
     current_func: FuncDef | None = None
     func_indent: int = -1
 
+    # Function headers need all their significant tokens; one buffer holds
+    # them in turn and _parse_func_header only reads it during the call.
+    sig: list[Token] = []
+    keep = sig.append
+    insignificant = _INSIGNIFICANT
+
     for lineno, toks in enumerate(all_tokens):
-        sig = _significant_tokens(toks)
-        if not sig:
+        meta = line_meta[lineno]
+        if meta[0] < 0:
             continue
 
+        first = toks[meta[0]]
+        first_sig_token[lineno] = first
+        line_opens_block[lineno] = (
+            stripped[lineno].endswith(':')
+            and stripped[lineno].startswith(_BLOCK_OPENER_PREFIXES)
+        )
         indent = line_indents[lineno]
 
         if current_func is not None:
@@ -264,30 +416,187 @@ def parse_document(source: str) -> ParsedDocument:
             else:
                 current_func.end_line = lineno
 
-        if sig[0].type == TokenType.KEYWORD and sig[0].value == "कार्यम्":
+        if first.type == TokenType.KEYWORD and first.value == _FUNCTION_KEYWORD:
+            sig.clear()
+            for t in toks:
+                if t.type not in insignificant:
+                    keep(t)
             func_def = _parse_func_header(sig, lineno, indent)
             if func_def:
                 functions[func_def.name] = func_def
                 current_func = func_def
                 func_indent = indent
                 for p in func_def.params:
-                    key = f"{func_def.name}:{p.name}"
+                    key = (func_def.name, p.name)
                     if key not in variables:
                         variables[key] = VarDef(p.name, p.line, p.col, scope=func_def.name)
                 continue
 
-        _extract_assignment(sig, lineno, indent, variables, current_func)
+        _extract_assignment(toks, meta, lineno, indent, variables, current_func)
 
     if current_func is not None:
-        current_func.end_line = len(raw_lines) - 1
+        current_func.end_line = line_count - 1
+
+    variables_by_scope: dict[str | None, list[VarDef]] = {}
+    for vdef in variables.values():
+        variables_by_scope.setdefault(vdef.scope, []).append(vdef)
 
-    return ParsedDocument(
+    func_names = frozenset(functions)
+    param_names = frozenset(p.name for fdef in functions.values() for p in fdef.params)
+
+    doc = ParsedDocument(
         tokens=all_tokens,
         functions=functions,
         variables=variables,
         line_indents=line_indents,
         lines=raw_lines,
+        global_variables=variables_by_scope.setdefault(None, []),
+        scope_by_line=_build_scope_by_line(functions, line_count),
+        token_starts=token_starts,
+        stripped=stripped,
+        first_sig_token=first_sig_token,
+        line_meta=line_meta,
+        line_opens_block=line_opens_block,
+        token_arrays=_build_token_arrays(all_tokens, func_names, param_names, previous, window),
+        functions_by_prefix=index_by_prefix(functions.values(), lambda f: f.name),
+        variables_by_scope=variables_by_scope,
+        func_names=func_names,
+        param_names=param_names,
     )
+    if previous is not None and window is not None:
+        _carry_over_diagnostics(doc, previous, window)
+    return doc
+
+
+def _changed_lines(old: list[str], new: list[str]) -> tuple[int, int, int]:
+    """@brief Locate the edited region between two versions of a document.
+    @param old  Previous lines.
+    @param new  Current lines.
+    @return     (start, old_stop, new_stop): old[:start] == new[:start] and
+                old[old_stop:] == new[new_stop:].
+    """
+    limit = min(len(old), len(new))
+    start = 0
+    while start < limit and old[start] == new[start]:
+        start += 1
+    old_stop = len(old)
+    new_stop = len(new)
+    while old_stop > start and new_stop > start and old[old_stop - 1] == new[new_stop - 1]:
+        old_stop -= 1
+        new_stop -= 1
+    return start, old_stop, new_stop
+
+
+def _carry_over_diagnostics(
+    doc: ParsedDocument,
+    previous: ParsedDocument,
+    window: tuple[int, int, int],
+) -> None:
+    """@brief Hand the lines outside the edit their old diagnostics.
+    @param doc       Freshly parsed document.
+    @param previous  Earlier parse of the same document.
+    @param window    Edited region, as returned by _changed_lines.
+
+    Line-local diagnostics depend on the line text and on the set of defined
+    function names, so they are only reused when the latter is unchanged.
+    """
+    start, old_stop, new_stop = window
+    old_diags = previous.diags_by_line
+    if old_diags is None or doc.func_names != previous.func_names:
+        return
+    shift = old_stop - new_stop
+    carried: list[list | None] = [None] * len(doc.lines)
+    carried[:start] = old_diags[:start]
+    for lineno in range(new_stop, len(doc.lines)):
+        carried[lineno] = old_diags[lineno + shift]
+    doc.prev_diags_by_line = carried
+
+
+def _build_token_arrays(
+    all_tokens: list[list[Token]],
+    func_names: frozenset[str],
+    param_names: frozenset[str],
+    previous: ParsedDocument | None = None,
+    window: tuple[int, int, int] | None = None,
+) -> TokenArrays:
+    """@brief Flatten per-line token objects into parallel arrays.
+    @param all_tokens   Tokens of every line.
+    @param func_names   Names of the document's functions.
+    @param param_names  Names of all their parameters.
+    @param previous     Earlier parse whose arrays cover the unedited lines.
+    @param window       Edited region, as returned by _changed_lines.
+    @return             TokenArrays with one entry per token, values interned in a table.
+
+    With `previous`, only the lines in the window are flattened; the others
+    are sliced out of the old arrays. Columns are per line, so only the line
+    offsets after the window move. The value table is shared with (and only
+    ever appended to by) later parses, and is rebuilt once it has gathered
+    too many values no longer in use.
+    """
+    old = previous.token_arrays if previous is not None else None
+    if old is None or window is None or len(old.values) > 2 * len(old.types) + 1024:
+        old = None
+        start, old_stop, new_stop = 0, 0, len(all_tokens)
+        values: list[str] = []
+        value_index: dict[str, int] = {}
+    else:
+        start, old_stop, new_stop = window
+        values = old.values
+        value_index = old.value_index
+
+    # Token types follow from the text alone, so a value naming a function or
+    # parameter only ever appears as an identifier and can be looked up as is.
+    role_of = {name: IdentRole.PARAMETER for name in param_names}
+    role_of.update((name, IdentRole.FUNCTION) for name in func_names)
+    role_get = role_of.get
+    other = IdentRole.OTHER
+
+    edited = all_tokens[start:new_stop]
+    flat = [t for toks in edited for t in toks]
+    setdefault = value_index.setdefault
+    types = array('B', [t.type for t in flat])
+    roles = array('B', [role_get(t.value, other) for t in flat])
+    cols = array('i', [t.col for t in flat])
+    end_cols = array('i', [t.end_col for t in flat])
+    value_idx = array('i', [setdefault(t.value, len(value_index)) for t in flat])
+    values.extend(islice(value_index, len(values), None))
+    base = old.line_offsets[start] if old is not None else 0
+    line_offsets = array('i', accumulate((len(toks) for toks in edited), initial=base))
+    if old is None:
+        return TokenArrays(types, roles, cols, end_cols, value_idx, values, line_offsets, value_index)
+
+    head = old.line_offsets[start]
+    tail = old.line_offsets[old_stop]
+    delta = base + len(flat) - tail
+    types = old.types[:head] + types + old.types[tail:]
+    cols = old.cols[:head] + cols + old.cols[tail:]
+    end_cols = old.end_cols[:head] + end_cols + old.end_cols[tail:]
+    value_idx = old.value_idx[:head] + value_idx + old.value_idx[tail:]
+    line_offsets = (
+        old.line_offsets[:start]
+        + line_offsets
+        + array('i', [off + delta for off in old.line_offsets[old_stop + 1:]])
+    )
+    if previous is not None and func_names == previous.func_names and param_names == previous.param_names:
+        roles = old.roles[:head] + roles + old.roles[tail:]
+    else:
+        value_roles = [role_get(v, other) for v in values]
+        roles = array('B', [value_roles[i] for i in value_idx])
+    return TokenArrays(types, roles, cols, end_cols, value_idx, values, line_offsets, value_index)
+
+
+def _build_scope_by_line(functions: dict[str, FuncDef], line_count: int) -> list[str | None]:
+    """@brief Map every line to the name of its enclosing function.
+    @param functions   Function definitions of the document.
+    @param line_count  Number of lines in the document.
+    @return            List where index i holds the scope name of line i (None if global).
+    """
+    scopes: list[str | None] = [None] * line_count
+    for fname, fdef in functions.items():
+        for line in range(fdef.line + 1, min(fdef.end_line, line_count - 1) + 1):
+            if scopes[line] is None:
+                scopes[line] = fname
+    return scopes
 
 
 def _parse_func_header(sig: list[Token], lineno: int, indent: int) -> FuncDef | None:
@@ -332,27 +641,31 @@ def _parse_func_header(sig: list[Token], lineno: int, indent: int) -> FuncDef |
 
 
 def _extract_assignment(
-    sig: list[Token],
+    toks: list[Token],
+    meta: LineMeta,
     lineno: int,
     indent: int,
-    variables: dict[str, VarDef],
+    variables: dict[tuple[str | None, str], VarDef],
     current_func: FuncDef | None,
 ) -> None:
     """@brief Detect `name = expr` and record the variable if first occurrence.
-    @param sig           Significant tokens on the line.
+    @param toks          Tokens on the line.
+    @param meta          Where the line's leading significant tokens are.
     @param lineno        0-based line number.
     @param indent        Indentation level.
-    @param variables     Variable registry to update.
+    @param variables     Variable registry to update, keyed by (scope, name).
     @param current_func  Enclosing function, or None for global scope.
     """
-    if len(sig) < 3:
+    if meta[2] < 0:
         return
 
-    if (sig[0].type == TokenType.IDENTIFIER
-            and sig[1].type == TokenType.OPERATOR
-            and sig[1].value == '='):
-        name = sig[0].value
-        scope = current_func.name if current_func else "global"
-        key = f"{scope}:{name}" if current_func else name
+    target = toks[meta[0]]
+    op = toks[meta[1]]
+    if (target.type == TokenType.IDENTIFIER
+            and op.type == TokenType.OPERATOR
+            and op.value == '='):
+        name = target.value
+        scope = current_func.name if current_func else None
+        key = (scope, name)
         if key not in variables:
-            variables[key] = VarDef(name, lineno, sig[0].col, scope=scope)
+            variables[key] = VarDef(name, lineno, target.col, scope=scope)
@@ -3,9 +3,11 @@
 
 from __future__ import annotations
 
+from array import array
+
 from lsprotocol.types import SemanticTokens
 
-from .parser import ParsedDocument, TokenType
+from .parser import IdentRole, ParsedDocument, TokenType
 
 SEMANTIC_TOKEN_TYPES = [
     "keyword",
@@ -25,7 +27,7 @@ SEMANTIC_TOKEN_MODIFIERS: list[str] = [
     "readonly",
 ]
 
-_TYPE_MAP = {
+_TYPE_MAP: dict[int, int] = {
     TokenType.KEYWORD: 0,
     TokenType.BUILTIN: 1,
     TokenType.IDENTIFIER: 2,
@@ -37,55 +39,59 @@ _TYPE_MAP = {
     TokenType.CONSTANT: 8,
 }
 
-_SKIP = {
-    TokenType.WHITESPACE,
-    TokenType.PAREN_OPEN,
-    TokenType.PAREN_CLOSE,
-    TokenType.BRACKET_OPEN,
-    TokenType.BRACKET_CLOSE,
-    TokenType.COMMA,
-    TokenType.COLON,
-    TokenType.UNKNOWN,
+# Semantic type of identifiers that name a function or a parameter.
+_ROLE_TYPES: dict[int, int] = {
+    IdentRole.FUNCTION: 1,
+    IdentRole.PARAMETER: 7,
 }
 
+# _TYPE_MAP as a list indexed by TokenType value; -1 for the token types
+# (whitespace, brackets, punctuation, ...) that are not highlighted.
+_TYPE_TABLE: list[int] = [_TYPE_MAP.get(t, -1) for t in range(max(TokenType) + 1)]
+
 
 def provide_semantic_tokens(doc: ParsedDocument) -> SemanticTokens:
     """@brief Produce the semantic tokens data array for the full document.
     @param doc  Parsed document.
     @return     SemanticTokens with the encoded data array.
     """
-    data: list[int] = []
+    arrays = doc.token_arrays
+    types = arrays.types
+    roles = arrays.roles
+    cols = arrays.cols
+    end_cols = arrays.end_cols
+    line_offsets = arrays.line_offsets
+
+    # Five slots per token, filled in place (the modifier slot stays 0) and
+    # trimmed to what was emitted.
+    data = array('I', [0]) * (5 * len(types))
+    k = 0
     prev_line = 0
     prev_col = 0
 
-    param_names: set[str] = set()
-    for fdef in doc.functions.values():
-        for p in fdef.params:
-            param_names.add(p.name)
-
-    func_names: set[str] = set(doc.functions.keys())
-
-    for line_tokens in doc.tokens:
-        for tok in line_tokens:
-            if tok.type in _SKIP:
-                continue
+    type_table = _TYPE_TABLE
 
-            token_type = _TYPE_MAP.get(tok.type)
-            if token_type is None:
+    for line in range(len(line_offsets) - 1):
+        for i in range(line_offsets[line], line_offsets[line + 1]):
+            token_type = type_table[types[i]]
+            if token_type < 0:
                 continue
 
-            if tok.type == TokenType.IDENTIFIER:
-                if tok.value in func_names:
-                    token_type = 1
-                elif tok.value in param_names:
-                    token_type = 7
+            role = roles[i]
+            if role:
+                token_type = _ROLE_TYPES[role]
 
-            length = tok.end_col - tok.col
-            delta_line = tok.line - prev_line
-            delta_col = tok.col if delta_line > 0 else tok.col - prev_col
+            col = cols[i]
+            delta_line = line - prev_line
+            delta_col = col if delta_line > 0 else col - prev_col
 
-            data.extend([delta_line, delta_col, length, token_type, 0])
-            prev_line = tok.line
-            prev_col = tok.col
+            data[k] = delta_line
+            data[k + 1] = delta_col
+            data[k + 2] = end_cols[i] - col
+            data[k + 3] = token_type
+            k += 5
+            prev_line = line
+            prev_col = col
 
+    del data[k:]
     return SemanticTokens(data=data)
@@ -7,6 +7,8 @@
 from __future__ import annotations
 
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from lsprotocol.types import (
     TEXT_DOCUMENT_COMPLETION,
@@ -20,6 +22,7 @@ from lsprotocol.types import (
     CompletionList,
     CompletionParams,
     DefinitionParams,
+    Diagnostic,
     DidChangeTextDocumentParams,
     DidCloseTextDocumentParams,
     DidOpenTextDocumentParams,
@@ -31,10 +34,11 @@ from lsprotocol.types import (
     SemanticTokens,
     SemanticTokensLegend,
     SemanticTokensParams,
+    TextDocumentSyncKind,
 )
 from pygls.lsp.server import LanguageServer
 
-from .analyzer import analyze
+from .analyzer import iter_analyze
 from .completion import provide_completions
 from .definition import provide_definition
 from .hover import provide_hover
@@ -44,6 +48,25 @@ from .semantic_tokens import SEMANTIC_TOKEN_MODIFIERS, SEMANTIC_TOKEN_TYPES, pro
 log = logging.getLogger(__name__)
 
 _doc_cache: dict[str, ParsedDocument] = {}
+# Analysis key (see _analysis_key) and published diagnostics of each cached parse.
+_diag_cache: dict[str, tuple[tuple[tuple[int, str], ...], list[Diagnostic]]] = {}
+
+_EARLY_BATCH = 50
+
+# Edits are parsed on one worker thread once typing pauses for this long, so
+# completion and hover are answered (from the last parse) while it runs.
+_DEBOUNCE_SECONDS = 0.05
+
+_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="SansScript-parse")
+# Guards _doc_cache, _diag_cache, _pending, _generation and _open, shared with the worker thread.
+_cache_lock = threading.Lock()
+_pending: dict[str, threading.Timer] = {}
+# Bumped on every scheduled parse and on close, and never reset, so a parse
+# whose number is no longer current has been superseded (or its document
+# closed, perhaps reopened since) and publishes nothing.
+_generation: dict[str, int] = {}
+# Documents open in the client; parses of any other document are not cached.
+_open: set[str] = set()
 
 
 def _publish_diagnostics(ls: LanguageServer, uri: str, diags) -> None:
@@ -52,38 +75,139 @@ def _publish_diagnostics(ls: LanguageServer, uri: str, diags) -> None:
     )
 
 
-def _reparse(ls: LanguageServer, uri: str, text: str) -> None:
-    """@brief Parse document, cache result, and publish diagnostics."""
-    doc = parse_document(text)
-    _doc_cache[uri] = doc
-    diags = analyze(doc)
-    _publish_diagnostics(ls, uri, diags)
+def _analysis_key(doc: ParsedDocument) -> tuple[tuple[int, str], ...]:
+    """@brief Number and text of every line of doc that holds code.
+
+    Diagnostics are computed from those lines alone (blank and comment-only
+    lines never get one), so two parses with equal keys have equal
+    diagnostics.
+    """
+    lines = doc.lines
+    return tuple(
+        (lineno, lines[lineno])
+        for lineno, first in enumerate(doc.first_sig_token)
+        if first is not None
+    )
+
+
+def _reuse_diagnostics(doc: ParsedDocument, previous: ParsedDocument) -> None:
+    """@brief Hand doc the per-line diagnostics of an equivalent previous parse.
+
+    Only blank and comment-only lines differ between the two, and those have
+    no diagnostics, so the table is copied and padded with empty lines.
+    """
+    old = previous.diags_by_line or []
+    line_count = len(doc.lines)
+    doc.diags_by_line = old[:line_count] + [[] for _ in range(line_count - len(old))]
+    doc.prev_diags_by_line = None
+
+
+def _reparse(ls: LanguageServer, uri: str, text: str, generation: int) -> None:
+    """@brief Parse document, cache result, and publish diagnostics.
+    @param generation  Value of _generation[uri] when this parse was scheduled.
+
+    On a document's first parse nothing is displayed yet, so the first
+    _EARLY_BATCH diagnostics are published as soon as they are found; later
+    parses publish once to avoid replacing the shown set with a partial one.
+    Edits that leave every code line as it was (blank lines and comments
+    only) republish the previous diagnostics without analyzing again.
+    Runs on the worker thread, whose futures nobody waits on, so errors are
+    logged here rather than lost.
+    """
+    try:
+        with _cache_lock:
+            if _generation.get(uri) != generation:
+                return
+            previous = _doc_cache.get(uri)
+            cached = _diag_cache.get(uri)
+        doc = parse_document(text, previous)
+        key = _analysis_key(doc)
+        if previous is not None and cached is not None and cached[0] == key:
+            _reuse_diagnostics(doc, previous)
+            diags = cached[1]
+        else:
+            diags = []
+            for diag in iter_analyze(doc):
+                diags.append(diag)
+                if previous is None and len(diags) == _EARLY_BATCH:
+                    with _cache_lock:
+                        # Dropped if the document was closed or edited since.
+                        if _generation.get(uri) == generation and uri in _open:
+                            _publish_diagnostics(ls, uri, list(diags))
+        with _cache_lock:
+            if uri not in _open:
+                return
+            # Still newer than what is cached, so keep it even if superseded.
+            _doc_cache[uri] = doc
+            _diag_cache[uri] = (key, diags)
+            # Published under the lock, so a did_close cannot clear the
+            # client's diagnostics between this check and the publish.
+            if _generation[uri] == generation:
+                _publish_diagnostics(ls, uri, diags)
+    except Exception:
+        log.exception("Failed to parse %s", uri)
+
+
+def _schedule_reparse(ls: LanguageServer, uri: str, text: str, delay: float = _DEBOUNCE_SECONDS) -> None:
+    """@brief Queue a parse of `text` on the worker thread after `delay` seconds.
+
+    A later call for the same document cancels this one if its timer has not
+    fired yet, and makes it a no-op if it is still waiting in the queue.
+    """
+    with _cache_lock:
+        generation = _generation.get(uri, 0) + 1
+        _generation[uri] = generation
+        _open.add(uri)
+        timer = _pending.pop(uri, None)
+        if timer is not None:
+            timer.cancel()
+        if delay <= 0:
+            _worker.submit(_reparse, ls, uri, text, generation)
+            return
+        timer = threading.Timer(delay, _worker.submit, (_reparse, ls, uri, text, generation))
+        timer.daemon = True
+        _pending[uri] = timer
+        timer.start()
 
 
 def get_parsed(uri: str) -> ParsedDocument | None:
-    return _doc_cache.get(uri)
+    with _cache_lock:
+        return _doc_cache.get(uri)
 
 
 def create_server() -> LanguageServer:
     """@brief Create and configure the SansScript language server.
     @return Configured LanguageServer ready to start.
     """
-    server = LanguageServer("SansScript-LSP", "v0.1.0")
+    server = LanguageServer(
+        "SansScript-LSP",
+        "v0.1.0",
+        text_document_sync_kind=TextDocumentSyncKind.Incremental,
+    )
 
     @server.feature(TEXT_DOCUMENT_DID_OPEN)
     def did_open(ls: LanguageServer, params: DidOpenTextDocumentParams):
-        _reparse(ls, params.text_document.uri, params.text_document.text)
+        _schedule_reparse(ls, params.text_document.uri, params.text_document.text, delay=0)
 
     @server.feature(TEXT_DOCUMENT_DID_CHANGE)
     def did_change(ls: LanguageServer, params: DidChangeTextDocumentParams):
+        # pygls has already applied the range edits to its workspace copy;
+        # parse_document then re-tokenizes only the lines they touched.
         if params.content_changes:
-            text = params.content_changes[-1].text
-            _reparse(ls, params.text_document.uri, text)
+            uri = params.text_document.uri
+            _schedule_reparse(ls, uri, ls.workspace.get_text_document(uri).source)
 
     @server.feature(TEXT_DOCUMENT_DID_CLOSE)
     def did_close(ls: LanguageServer, params: DidCloseTextDocumentParams):
         uri = params.text_document.uri
-        _doc_cache.pop(uri, None)
+        with _cache_lock:
+            timer = _pending.pop(uri, None)
+            if timer is not None:
+                timer.cancel()
+            _generation[uri] = _generation.get(uri, 0) + 1
+            _open.discard(uri)
+            _doc_cache.pop(uri, None)
+            _diag_cache.pop(uri, None)
         _publish_diagnostics(ls, uri, [])
 
     @server.feature(TEXT_DOCUMENT_COMPLETION)
@@ -1,6 +1,7 @@
 ## @file symbols.py
 ## @brief SansScript keyword, builtin, and constant definitions with documentation.
 
+import sys
 from dataclasses import dataclass, field
 
 
@@ -10,6 +11,11 @@ class KeywordInfo:
     english: str
     doc: str
     snippet: str = ""
+    hover_md: str = field(default="", init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.name = sys.intern(self.name)
+        self.hover_md = f"**{self.name}** — `{self.english}`\n\n{self.doc}"
 
 
 @dataclass
@@ -19,6 +25,22 @@ class BuiltinInfo:
     doc: str
     params: list[str] = field(default_factory=list)
     return_type: str = ""
+    hover_md: str = field(default="", init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.name = sys.intern(self.name)
+        self.hover_md = (
+            f"**{self.name}** — `{self.english}`\n\n"
+            f"```\n{self.name}({', '.join(self.params)})\n```\n\n"
+            f"{self.doc}\n\n"
+            f"Returns: `{self.return_type}`"
+        )
+
+
+# Symbol names are interned, like identifier token values in the parser, so
+# set/dict lookups of token values hit on identity.
+def _intern_keys(table: dict[str, str]) -> dict[str, str]:
+    return {sys.intern(name): value for name, value in table.items()}
 
 
 KEYWORDS: list[KeywordInfo] = [
@@ -63,18 +85,18 @@ KEYWORDS: list[KeywordInfo] = [
 ]
 
 KEYWORD_MAP: dict[str, KeywordInfo] = {kw.name: kw for kw in KEYWORDS}
-KEYWORD_NAMES: set[str] = {kw.name for kw in KEYWORDS}
+KEYWORD_NAMES: frozenset[str] = frozenset(kw.name for kw in KEYWORDS)
 
-CONSTANTS: dict[str, str] = {
+CONSTANTS: dict[str, str] = _intern_keys({
     "सत्यम्": "true  — Boolean true",
     "असत्यम्": "false — Boolean false",
-}
+})
 
-LOGICAL_OPS: dict[str, str] = {
+LOGICAL_OPS: dict[str, str] = _intern_keys({
     "च": "and — Logical AND",
     "वा": "or  — Logical OR",
     "न": "not — Logical NOT (prefix)",
-}
+})
 
 BUILTINS: list[BuiltinInfo] = [
     BuiltinInfo(
@@ -158,16 +180,18 @@ BUILTINS: list[BuiltinInfo] = [
 ]
 
 BUILTIN_MAP: dict[str, BuiltinInfo] = {b.name: b for b in BUILTINS}
-BUILTIN_NAMES: set[str] = {b.name for b in BUILTINS}
+BUILTIN_NAMES: frozenset[str] = frozenset(b.name for b in BUILTINS)
 
-OPERATORS = {
+OPERATORS: frozenset[str] = frozenset({
     "+", "-", "*", "/", "%",
     "==", "!=", "<", ">", "<=", ">=",
     "=",
-}
+})
 
-BLOCK_OPENERS: set[str] = {"यदि", "अथवा_यदि", "अन्यथा", "यावत्", "कार्यम्"}
+BLOCK_OPENERS: frozenset[str] = frozenset(
+    sys.intern(name) for name in ("यदि", "अथवा_यदि", "अन्यथा", "यावत्", "कार्यम्")
+)
 
-CONSTANT_NAMES: set[str] = set(CONSTANTS)
-LOGICAL_OP_NAMES: set[str] = set(LOGICAL_OPS)
-ALL_KNOWN: set[str] = KEYWORD_NAMES | BUILTIN_NAMES | CONSTANT_NAMES | LOGICAL_OP_NAMES
+CONSTANT_NAMES: frozenset[str] = frozenset(CONSTANTS)
+LOGICAL_OP_NAMES: frozenset[str] = frozenset(LOGICAL_OPS)
+ALL_KNOWN: frozenset[str] = KEYWORD_NAMES | BUILTIN_NAMES | CONSTANT_NAMES | LOGICAL_OP_NAMES
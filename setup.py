@@ -0,0 +1,25 @@
+## @file setup.py
+## @brief Optional mypyc compilation of the hot-path modules.
+##
+## Project metadata lives in pyproject.toml; a plain `pip install .` stays
+## pure Python. With SANSSCRIPT_LSP_MYPYC=1 (and mypy installed in the build
+## environment) the modules below are compiled to C extensions. The .py
+## sources are still installed and used wherever no extension was built.
+
+import os
+
+from setuptools import setup
+
+_MYPYC_MODULES = [
+    "SansScript_LSP/analyzer.py",
+    "SansScript_LSP/parser.py",
+    "SansScript_LSP/semantic_tokens.py",
+]
+
+ext_modules = []
+if os.environ.get("SANSSCRIPT_LSP_MYPYC") == "1":
+    from mypyc.build import mypycify
+
+    ext_modules = mypycify(_MYPYC_MODULES)
+
+setup(ext_modules=ext_modules)
@@ -0,0 +1,73 @@
+## @file test_completion.py
+## @brief Checks of where completion is offered.
+##
+## Each case marks the cursor with '|' in the source text.
+
+from __future__ import annotations
+
+import unittest
+
+from lsprotocol.types import CompletionItem, Position
+
+from SansScript_LSP.completion import provide_completions
+from SansScript_LSP.parser import parse_document
+
+
+def _complete(marked: str) -> list[CompletionItem]:
+    """@brief Completion items at the '|' in marked (which is removed first)."""
+    before, after = marked.split("|")
+    line = before.count("\n")
+    col = len(before) - (before.rfind("\n") + 1)
+    doc = parse_document(before + after)
+    return provide_completions(doc, Position(line=line, character=col)).items
+
+
+class StringAndCommentTest(unittest.TestCase):
+    def test_nothing_inside_a_string(self):
+        self.assertEqual(_complete('x = "ab|c"\n'), [])
+
+    def test_nothing_after_an_unclosed_quote(self):
+        self.assertEqual(_complete('x = "ab|\n'), [])
+        self.assertEqual(_complete('x = "|\n'), [])
+
+    def test_nothing_inside_a_comment(self):
+        self.assertEqual(_complete("x = 1 #|\n"), [])
+        self.assertEqual(_complete("x = 1 # co|mment\n"), [])
+
+    def test_offered_right_after_a_closing_quote(self):
+        self.assertNotEqual(_complete('x = "abc"|\n'), [])
+        self.assertNotEqual(_complete('x = "abc" |\n'), [])
+
+    def test_offered_right_before_a_comment(self):
+        self.assertNotEqual(_complete("x = 1 |# c\n"), [])
+
+
+class VariableOrderTest(unittest.TestCase):
+    SOURCE = (
+        "गणना = 1\n"
+        "y = 2\n"
+        "कार्यम् f(a):\n"
+        "    गणना = 3\n"
+        "    |\n"
+        "    प्रतिददाति गणना\n"
+    )
+
+    def variables(self, marked: str) -> list[tuple[str, str | None]]:
+        return [
+            (item.label, item.detail) for item in _complete(marked)
+            if item.detail is not None and item.detail.startswith("variable")
+        ]
+
+    def test_locals_come_first_and_shadow_globals(self):
+        variables = self.variables(self.SOURCE)
+        labels = [label for label, _ in variables]
+        self.assertEqual(labels.count("गणना"), 1)
+        self.assertIn(("गणना", "variable (f)"), variables)
+        self.assertLess(labels.index("गणना"), labels.index("y"))
+        self.assertLess(labels.index("a"), labels.index("y"))
+
+    def test_globals_listed_outside_functions(self):
+        marked = self.SOURCE.replace("    |\n", "") + "z = 4\n|\n"
+        variables = self.variables(marked)
+        self.assertIn(("गणना", "variable (global)"), variables)
+        self.assertNotIn(("गणना", "variable (f)"), variables)
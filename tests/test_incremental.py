@@ -0,0 +1,229 @@
+## @file test_incremental.py
+## @brief Differential checks of incremental parsing and diagnostics.
+##
+## Every edited text is parsed twice, once on top of the previous parse and
+## once from scratch, and the two results (and their diagnostics) must agree.
+## Edits are random but seeded, so a failure reproduces.
+
+from __future__ import annotations
+
+import random
+import unittest
+from unittest import mock
+
+from SansScript_LSP import server
+from SansScript_LSP.analyzer import analyze
+from SansScript_LSP.parser import ParsedDocument, _changed_lines, parse_document
+
+SAMPLE = """\
+# sample program
+गणना = १०
+नाम = "राम"
+कार्यम् क्रमगुणित(न्, क):
+    यदि न् <= १:
+        प्रतिददाति १
+    अथवा_यदि न् == २:
+        प्रतिददाति २
+    अन्यथा:
+        फल = न् * क्रमगुणित(न् - १)
+        प्रतिददाति फल
+
+कार्यम् योग(a, b):
+    c = a + b
+    प्रतिददाति c
+अन्यथा:
+    मुद्रय(1)
+अथवा_यदि x:
+    मुद्रय(2)
+यदि सत्यम् च असत्यम्
+    मुद्रय((3)
+अज्ञात(5) # comment (
+x = [1, 2
+\ty = x
+यावत् x != 3:
+मुद्रय(क्रमगुणित(१०))
+कार्यम् बुरा
+कार्यम् अधूरा(a:
+list_ = [1,2]
+z = योग(1, 2) >= 3 @ 4
+"""
+
+# Single characters and fragments that open or close blocks, define or call
+# functions and add or remove whole lines.
+_FRAGMENTS = list("()[]:=<>!+-*/,@ #\"\n\t abx1२") + [
+    "कार्यम् ", "यदि ", "अथवा_यदि ", "अन्यथा:", "\n    ", "\n\n", "\n# c\n",
+    "f(", "अज्ञात(", "मुद्रय(", "==", "योग", "क्रमगुणित",
+]
+
+_EDITS = 400
+
+# Fields that must not depend on whether a parse reused a previous one.
+_FIELDS = (
+    "tokens", "functions", "variables", "line_indents", "lines",
+    "global_variables", "scope_by_line", "token_starts", "stripped",
+    "first_sig_token", "line_meta", "line_opens_block", "func_names",
+    "param_names",
+)
+
+
+def _edits(seed: int, count: int = _EDITS):
+    """@brief Yield successive texts, each one random edit away from the last.
+    @param seed   Seed of the edit sequence.
+    @param count  Number of edits.
+    """
+    rng = random.Random(seed)
+    text = SAMPLE
+    for _ in range(count):
+        i = rng.randrange(len(text) + 1)
+        if text and rng.random() < 0.45:
+            text = text[:i] + text[i + rng.randrange(1, 6):]
+        else:
+            text = text[:i] + rng.choice(_FRAGMENTS) + text[i:]
+        if rng.random() < 0.01:
+            text = SAMPLE
+        yield text
+
+
+def _diag_tuples(diags) -> list[tuple]:
+    """@brief Sortable, comparable form of a list of diagnostics."""
+    return sorted(
+        (d.range.start.line, d.range.start.character,
+         d.range.end.line, d.range.end.character, d.message, d.severity)
+        for d in diags
+    )
+
+
+def _decoded_arrays(doc: ParsedDocument) -> tuple:
+    """@brief Token arrays with values resolved, as the value table's order may differ."""
+    a = doc.token_arrays
+    return (
+        list(a.types), list(a.roles), list(a.cols), list(a.end_cols),
+        [a.values[i] for i in a.value_idx], list(a.line_offsets),
+    )
+
+
+class ChangedLinesTest(unittest.TestCase):
+    def test_window_covers_exactly_the_edit(self):
+        old = ["a", "b", "c", "d"]
+        self.assertEqual(_changed_lines(old, old), (4, 4, 4))
+        self.assertEqual(_changed_lines(old, ["a", "x", "c", "d"]), (1, 2, 2))
+        self.assertEqual(_changed_lines(old, ["a", "b", "x", "y", "c", "d"]), (2, 2, 4))
+        self.assertEqual(_changed_lines(old, ["a", "d"]), (1, 3, 1))
+        self.assertEqual(_changed_lines(old, []), (0, 4, 0))
+
+    def test_repeated_lines_do_not_overlap(self):
+        start, old_stop, new_stop = _changed_lines(["a", "a"], ["a", "a", "a"])
+        self.assertLessEqual(start, old_stop)
+        self.assertLessEqual(start, new_stop)
+        self.assertEqual((old_stop - start, new_stop - start), (0, 1))
+
+
+class IncrementalParseTest(unittest.TestCase):
+    def check_sequence(self, seed: int) -> None:
+        previous = parse_document(SAMPLE)
+        analyze(previous)
+        for step, text in enumerate(_edits(seed)):
+            doc = parse_document(text, previous)
+            fresh = parse_document(text)
+            for name in _FIELDS:
+                self.assertEqual(
+                    getattr(doc, name), getattr(fresh, name),
+                    f"seed {seed}, edit {step}: {name} differs for {text!r}",
+                )
+            self.assertEqual(
+                _decoded_arrays(doc), _decoded_arrays(fresh),
+                f"seed {seed}, edit {step}: token arrays differ for {text!r}",
+            )
+            # Analyzing doc reuses the diagnostics carried over from previous.
+            self.assertEqual(
+                _diag_tuples(analyze(doc)), _diag_tuples(analyze(fresh)),
+                f"seed {seed}, edit {step}: diagnostics differ for {text!r}",
+            )
+            previous = doc
+
+    def test_random_edits(self):
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                self.check_sequence(seed)
+
+    def test_renaming_a_function_updates_roles(self):
+        previous = parse_document(SAMPLE)
+        analyze(previous)
+        text = SAMPLE.replace("कार्यम् योग(", "कार्यम् जोड़(")
+        doc = parse_document(text, previous)
+        self.assertEqual(_decoded_arrays(doc), _decoded_arrays(parse_document(text)))
+        self.assertEqual(_diag_tuples(analyze(doc)), _diag_tuples(analyze(parse_document(text))))
+
+
+class ServerReparseTest(unittest.TestCase):
+    URI = "file:///test.san"
+
+    def setUp(self):
+        self.published: dict[str, list] = {}
+        patcher = mock.patch.object(
+            server, "_publish_diagnostics",
+            lambda ls, uri, diags: self.published.__setitem__(uri, diags),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.forget)
+
+    def forget(self):
+        with server._cache_lock:
+            server._open.discard(self.URI)
+            server._generation.pop(self.URI, None)
+            server._doc_cache.pop(self.URI, None)
+            server._diag_cache.pop(self.URI, None)
+
+    def reparse(self, text: str) -> None:
+        with server._cache_lock:
+            server._open.add(self.URI)
+            generation = server._generation.get(self.URI, 0) + 1
+            server._generation[self.URI] = generation
+        server._reparse(None, self.URI, text, generation)
+
+    def test_published_diagnostics_match_fresh_analysis(self):
+        self.reparse(SAMPLE)
+        for step, text in enumerate(_edits(seed=7)):
+            self.reparse(text)
+            self.assertEqual(
+                _diag_tuples(self.published[self.URI]),
+                _diag_tuples(analyze(parse_document(text))),
+                f"edit {step}: published diagnostics differ for {text!r}",
+            )
+
+    def reparse_interrupted(self, interrupt) -> None:
+        """@brief First parse of a long document, calling interrupt() after ten diagnostics."""
+        iter_analyze = server.iter_analyze
+
+        def analyze_then_interrupt(doc):
+            for count, diag in enumerate(iter_analyze(doc), 1):
+                if count == 10:
+                    interrupt()
+                yield diag
+
+        with mock.patch.object(server, "iter_analyze", analyze_then_interrupt):
+            self.reparse("अज्ञात(\n" * (2 * server._EARLY_BATCH))
+
+    def test_close_during_first_analysis_publishes_nothing_after(self):
+        def close():
+            # What did_close does.
+            with server._cache_lock:
+                server._generation[self.URI] += 1
+                server._open.discard(self.URI)
+            server._publish_diagnostics(None, self.URI, [])
+
+        self.reparse_interrupted(close)
+        self.assertEqual(self.published[self.URI], [])
+
+    def test_superseded_first_analysis_publishes_no_early_batch(self):
+        def edit():
+            with server._cache_lock:
+                server._generation[self.URI] += 1
+
+        self.reparse_interrupted(edit)
+        self.assertNotIn(self.URI, self.published)
+
+
+if __name__ == "__main__":
+    unittest.main()